@@ -15,8 +15,38 @@ from pytomography.utils import check_if_class_contains_method
 from collections.abc import Callable
 from .preconditioned_gradient_ascent import OSEM
 
+def _dip_update(
+    x_network: torch.Tensor,
+    mu: torch.Tensor | float,
+    norm_BP_over_rho: torch.Tensor,
+    four_norm_BP_over_rho: torch.Tensor,
+    x_EM: torch.Tensor,
+    out: torch.Tensor,
+    buffer: torch.Tensor,
+) -> torch.Tensor:
+    r"""Closed form solution of the quadratic subproblem in Algorithm 1 of https://ieeexplore.ieee.org/document/8581448. The common term :math:`a = f(z;\theta) - \mu - H^T 1/\rho` is only computed once, and all operations are performed in place on the preallocated tensors ``out`` and ``buffer``.
+
+    Args:
+        x_network (torch.Tensor): Current network prediction :math:`f(z;\theta)`
+        mu (torch.Tensor | float): Scaled dual variable :math:`\mu`
+        norm_BP_over_rho (torch.Tensor): Precomputed :math:`H^T 1/\rho`
+        four_norm_BP_over_rho (torch.Tensor): Precomputed :math:`4 H^T 1/\rho`
+        x_EM (torch.Tensor): Object estimate following the EM update
+        out (torch.Tensor): Tensor the updated object estimate is written to
+        buffer (torch.Tensor): Scratch tensor of the same shape as ``out``
+
+    Returns:
+        torch.Tensor: Updated object estimate (``out``)
+    """
+    torch.sub(x_network, mu, out=out)
+    out.sub_(norm_BP_over_rho)
+    torch.square(out, out=buffer)
+    buffer.addcmul_(four_norm_BP_over_rho, x_EM)
+    buffer.sqrt_()
+    return out.add_(buffer).mul_(0.5)
+
 class DIPRecon:
-    r"""Implementation of the Deep Image Prior reconstruction technique (see https://ieeexplore.ieee.org/document/8581448). This reconstruction technique requires an instance of a user-defined ``prior_network`` that implements two functions: (i) a ``fit`` method that takes in an ``object`` (:math:`x`) which the network ``f(z;\theta)`` is subsequently fit to, and (ii) a ``predict`` function that returns the current network prediction :math:`f(z;\theta)`. For more details, see the Deep Image Prior tutorial.
+    r"""Implementation of the Deep Image Prior reconstruction technique (see https://ieeexplore.ieee.org/document/8581448). This reconstruction technique requires an instance of a user-defined ``prior_network`` that implements two functions: (i) a ``fit`` method that takes in an ``object`` (:math:`x`) which the network ``f(z;\theta)`` is subsequently fit to, and (ii) a ``predict`` function that returns the current network prediction :math:`f(z;\theta)`. The prediction should have the same shape as the object (``[1, Lx, Ly, Lz]``); it is converted to the standard contiguous memory layout used by the projectors. If the network output is guaranteed to be non-negative (e.g. it ends in a ReLU or Softplus), the network may set an attribute ``output_nonneg = True`` so that the prediction is not clamped at zero after each iteration. For more details, see the Deep Image Prior tutorial.
 
         Args:
             projections (torch.tensor): projection data :math:`g` to be reconstructed
@@ -25,6 +55,11 @@ class DIPRecon:
             rho (float, optional): Value of :math:`\rho` used in the optimization procedure. Defaults to 1.
             scatter (torch.tensor | float, optional): Projection space scatter estimate. Defaults to 0.
             precompute_normalization_factors (bool, optional): Whether to precompute :math:`H_m^T 1` and store on GPU in the OSEM network before reconstruction. Defaults to True.
+            prior_network_dtype (torch.dtype | None, optional): If given, ``prior_network.predict()`` is run under CUDA ``torch.autocast`` with this dtype (e.g. ``torch.bfloat16``) and the result is cast back to ``pytomography.dtype``; the network weights themselves are left untouched since they are trained by ``fit``. Ignored when running on the CPU. If None, the network is run at its own precision. Defaults to None.
+            use_cuda_graph (bool, optional): Whether to capture the closed form update that follows each EM subset step in a CUDA graph and replay it, removing per-step kernel launch overhead. Only used when reconstruction takes place on a CUDA device. Defaults to False.
+            compile_update (bool, optional): Whether to compile the closed form update with ``torch.compile`` (requires PyTorch 2.0 or later) so that its pointwise operations are fused into a single kernel. Defaults to False.
+            low_precision_update (bool, optional): Whether to evaluate the closed form update in ``torch.bfloat16``, halving its memory traffic; the result is converted back to ``pytomography.dtype``. This reduces accuracy where :math:`f(z;\theta) - \mu - H^T 1/\rho` is large and negative, so the full precision path should be used for validation. Defaults to False.
+            overlap_network_fit (bool, optional): Whether to run the first EM subset step of each outer iteration on a separate CUDA stream while ``prior_network.fit`` is running. This is exact, since the EM step only depends on the previous object estimate and not on the network prediction. Only used when reconstruction takes place on a CUDA device. Defaults to False.
         """
     def __init__(
         self,
@@ -32,23 +67,89 @@ class DIPRecon:
         prior_network: nn.Module,
         rho: float = 3e-3,
         EM_algorithm = OSEM,
+        prior_network_dtype: torch.dtype | None = None,
+        use_cuda_graph: bool = False,
+        compile_update: bool = False,
+        low_precision_update: bool = False,
+        overlap_network_fit: bool = False,
     ) -> None:
-        self.EM_algorithm = EM_algorithm(
-            likelihood,
-            object_initial = nn.ReLU()(prior_network.predict().clone())
-            )
         self.likelihood = likelihood
         self.prior_network = prior_network
         self.rho = rho
+        self.prior_network_dtype = prior_network_dtype
+        self.low_precision_update = low_precision_update
+        self.overlap_network_fit = overlap_network_fit
+        # All reconstruction quantities are kept on this device
+        self.device = torch.device(pytomography.device)
+        self._norm_BP = None
+        self.EM_algorithm = EM_algorithm(
+            likelihood,
+            object_initial = self._predict_network().clamp_min(0)
+            )
+        self.use_cuda_graph = use_cuda_graph
+        if compile_update:
+            if not hasattr(torch, 'compile'):
+                raise Exception("`compile_update=True` requires torch.compile (PyTorch 2.0 or later)")
+            # Shapes are fixed for the whole reconstruction; CUDA graphs are handled separately by `use_cuda_graph`
+            self._inner_update = torch.compile(_dip_update, dynamic=False, fullgraph=True, mode='max-autotune-no-cudagraphs')
+        else:
+            self._inner_update = _dip_update
         
-    def _compute_callback(self, n_iter: int, n_subset: int):
-        """Method for computing callbacks after each reconstruction iteration
+    def reset(self):
+        """Clears the cached normalization factor :math:`H^T 1`. Must be called if the system matrix of the likelihood is modified after the first reconstruction.
+        """
+        self._norm_BP = None
+        
+    def _predict_network(self) -> torch.Tensor:
+        r"""Returns the current network prediction :math:`f(z;\theta)`, using autocast if ``prior_network_dtype`` was specified.
+
+        Returns:
+            torch.Tensor: Network prediction in ``pytomography.dtype`` on ``pytomography.device`` with contiguous memory layout
+        """
+        if self.prior_network_dtype is None or self.device.type != 'cuda':
+            prediction = self.prior_network.predict()
+        else:
+            with torch.autocast(device_type='cuda', dtype=self.prior_network_dtype):
+                prediction = self.prior_network.predict()
+            prediction = prediction.to(pytomography.dtype)
+        # Networks may return e.g. channels last outputs; the projectors expect contiguous objects
+        return prediction.to(self.device, non_blocking=True).contiguous()
+        
+    def _EM_step(self, x: torch.Tensor, em_buffer: torch.Tensor, n_subsets: int, subset_idx: int) -> torch.Tensor:
+        """Performs a single EM subset update starting from the non-negative part of ``x``.
 
         Args:
-            n_iter (int): Number of iterations
-            n_subset (int): Number of subsets
+            x (torch.Tensor): Current object estimate
+            em_buffer (torch.Tensor): Preallocated tensor used as the object estimate of the EM algorithm
+            n_subsets (int): Number of subsets
+            subset_idx (int): Subset to update
+
+        Returns:
+            torch.Tensor: Object estimate following the EM update
+        """
+        em_buffer.copy_(x).clamp_min_(0)
+        self.EM_algorithm.set_object_prediction_(em_buffer)
+        return self.EM_algorithm(n_iters = 1, n_subsets = n_subsets, n_subset_specific=subset_idx)
+        
+    def _capture_update_graph(self, *update_args: torch.Tensor) -> torch.cuda.CUDAGraph:
+        """Captures the closed form update in a CUDA graph. The tensors in ``update_args`` are static: they must be updated in place before each replay.
+
+        Args:
+            update_args (torch.Tensor): Arguments passed to ``_dip_update``
+
+        Returns:
+            torch.cuda.CUDAGraph: Captured graph
         """
-        self.callback.run(self.object_prediction, n_iter, n_subset)
+        # Warmup on a side stream is required before capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            self._inner_update(*update_args)
+        torch.cuda.current_stream().wait_stream(stream)
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            self._inner_update(*update_args)
+        return graph
         
     def __call__(
         self,
@@ -68,22 +169,76 @@ class DIPRecon:
             torch.Tensor: Reconstructed image
         """
         self.callback = callback
+        run_callback = callback.run if callback is not None else None
         # Initialize quantities
-        mu = 0 
-        norm_BP = self.likelihood.system_matrix.compute_normalization_factor()
-        x = self.prior_network.predict()
-        x_network = x.clone()
-        for _ in range(n_iters):
-            for j in range(subit1):
-                for k in range(n_subsets_osem):
-                    self.EM_algorithm.object_prediction = nn.ReLU()(x.clone())
-                    x_EM = self.EM_algorithm(n_iters = 1, n_subsets = n_subsets_osem, n_subset_specific=k)
-                    x = 0.5 * (x_network - mu - norm_BP / self.rho) + 0.5 * torch.sqrt((x_network - mu - norm_BP / self.rho)**2 + 4 * x_EM * norm_BP / self.rho)
-            self.prior_network.fit(x + mu)
-            x_network = self.prior_network.predict()
-            mu += x - x_network
-            self.object_prediction = nn.ReLU()(x_network)
+        if self._norm_BP is None:
+            self._norm_BP = self.likelihood.system_matrix.compute_normalization_factor().to(self.device)
+        norm_BP = self._norm_BP
+        mu = torch.zeros_like(norm_BP)
+        x = self._predict_network()
+        # x_network is never modified in place, so it can share storage with x
+        x_network = x
+        # norm_BP and rho are fixed throughout reconstruction
+        update_dtype = torch.bfloat16 if self.low_precision_update else norm_BP.dtype
+        norm_BP_over_rho = (norm_BP / self.rho).to(update_dtype)
+        four_norm_BP_over_rho = 4 * norm_BP_over_rho
+        # Scratch space for the closed form update, reused at every subset step
+        update_out = torch.empty_like(norm_BP, dtype=update_dtype)
+        update_buffer = torch.empty_like(norm_BP, dtype=update_dtype)
+        if self.low_precision_update:
+            x_full_precision = torch.empty_like(norm_BP)
+        fit_target = torch.empty_like(norm_BP)
+        # Storage handed to the EM algorithm, which updates it in place
+        em_buffer = torch.empty_like(norm_BP)
+        graph = None
+        if self.use_cuda_graph and norm_BP.is_cuda:
+            static_x_network = x_network.clone()
+            graph = self._capture_update_graph(static_x_network, mu, norm_BP_over_rho, four_norm_BP_over_rho, em_buffer, update_out, update_buffer)
+        em_stream = torch.cuda.Stream() if (self.overlap_network_fit and norm_BP.is_cuda) else None
+        x_EM_prefetched = None
+        # Subsets are visited round-robin; the network is refit after every subit1 passes over all subsets
+        n_steps_per_iter = subit1 * n_subsets_osem
+        n_steps = n_iters * n_steps_per_iter
+        for step in range(n_steps):
+            k = step % n_subsets_osem
+            if x_EM_prefetched is None:
+                x_EM = self._EM_step(x, em_buffer, n_subsets_osem, k)
+            else:
+                torch.cuda.current_stream().wait_stream(em_stream)
+                x_EM, x_EM_prefetched = x_EM_prefetched, None
+            if graph is None:
+                x = self._inner_update(x_network, mu, norm_BP_over_rho, four_norm_BP_over_rho, x_EM, update_out, update_buffer)
+            else:
+                # em_buffer is a static input of the graph; OSEM updates it in place
+                if x_EM is not em_buffer:
+                    em_buffer.copy_(x_EM)
+                graph.replay()
+                x = update_out
+            if self.low_precision_update:
+                x = x_full_precision.copy_(x)
+            if (step + 1) % n_steps_per_iter != 0:
+                continue
+            n_iter = step // n_steps_per_iter
+            # The first EM step of the next iteration does not depend on the network, so it can run during fit
+            if em_stream is not None and step + 1 < n_steps:
+                em_stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(em_stream):
+                    x_EM_prefetched = self._EM_step(x, em_buffer, n_subsets_osem, 0)
+                if x_EM_prefetched is not em_buffer:
+                    x_EM_prefetched.record_stream(torch.cuda.current_stream())
+            # Gradients are only required for the network parameters
+            with torch.no_grad():
+                torch.add(x, mu, out=fit_target)
+            self.prior_network.fit(fit_target)
+            x_network = self._predict_network()
+            mu.add_(x).sub_(x_network)
+            if graph is not None:
+                static_x_network.copy_(x_network)
+            if getattr(self.prior_network, 'output_nonneg', False):
+                self.object_prediction = x_network
+            else:
+                self.object_prediction = x_network.clamp_min(0)
             # evaluate callback
-            if self.callback is not None:
-                self._compute_callback(n_iter = _, n_subset=None)
+            if run_callback is not None:
+                run_callback(self.object_prediction, n_iter, None)
         return self.object_prediction
\ No newline at end of file
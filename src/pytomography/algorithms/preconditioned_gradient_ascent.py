@@ -39,6 +39,14 @@ class PreconditionedGradientAscentAlgorithm:
         self.objects_stored = []
         self.projections_predicted_stored = []
                 
+    def set_object_prediction_(self, object: torch.Tensor) -> None:
+        """Sets the current object estimate to ``object`` without copying it. Since the object estimate is updated in place during reconstruction, ``object`` itself will be modified by subsequent calls to the algorithm; this lets callers reuse one preallocated tensor across many calls.
+
+        Args:
+            object (torch.Tensor): Object estimate with the same device and dtype used in reconstruction.
+        """
+        self.object_prediction = object
+                
     def _set_n_subsets(self, n_subsets: int):
         """Sets the number of subsets used in the reconstruction algorithm.
 
@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import Sequence
 import warnings
 import numpy as np
+import torch
 import os
 from scipy.optimize import curve_fit, minimize
 from scipy.signal import find_peaks
@@ -30,7 +31,7 @@ def bilinear_transform(
     """Function used to convert between Hounsfield Units at an effective CT energy and linear attenuation coefficient at a given SPECT radionuclide energy. It consists of two distinct linear curves in regions :math:`HU<0` and :math:`HU \geq 0`.
 
     Args:
-        HU (float): Hounsfield units at CT energy
+        HU (float): Hounsfield units at CT energy. May also be a ``np.array`` or ``torch.Tensor``.
         a1 (float): Fit parameter 1
         a2 (float): Fit parameter 2
         b1 (float): Fit parameter 3
@@ -39,6 +40,8 @@ def bilinear_transform(
     Returns:
         float: Linear attenuation coefficient at SPECT energy
     """
+    if isinstance(HU, torch.Tensor):
+        return torch.where(HU < 0, a1*HU + b1, a2*HU + b2).clamp_(min=0)
     output =  np.piecewise(
         HU,
         [HU < 0, HU >= 0],
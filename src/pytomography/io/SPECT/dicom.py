@@ -2,7 +2,7 @@ from __future__ import annotations
 import warnings
 import copy
 import os
-import collections.abc
+import functools
 from collections.abc import Sequence
 from pathlib import Path
 from typing import Sequence
@@ -10,8 +10,9 @@ import numpy as np
 import numpy.linalg as npl
 from scipy.ndimage import affine_transform
 import torch
+from torch.nn.functional import affine_grid, grid_sample
 import pydicom
-from pydicom.dataset import Dataset
+from pydicom.dataset import Dataset, FileDataset
 from pydicom.uid import generate_uid
 import pytomography
 from rt_utils import RTStructBuilder
@@ -28,19 +29,141 @@ from ..CT import (
 from ..shared import (
     open_multifile,
     _get_affine_multifile,
+    _map_parallel,
     create_ds
 )
 
+def _array_to_device(array: np.array) -> torch.Tensor:
+    """Converts a numpy array to a tensor of type ``pytomography.dtype`` on ``pytomography.device``. When the device is a GPU, the data is staged in pinned host memory so that the host to device copy can be performed asynchronously at full bandwidth.
+
+    Args:
+        array (np.array): Array to convert.
+
+    Returns:
+        torch.Tensor: Converted tensor.
+    """
+    if np.issubdtype(array.dtype, np.floating):
+        array = np.ascontiguousarray(array)
+    else:
+        # e.g. uint16 pixel data, which older versions of torch cannot wrap
+        array = np.ascontiguousarray(array, dtype=np.float32)
+    tensor = torch.from_numpy(array)
+    if torch.device(pytomography.device).type != 'cuda':
+        return tensor.to(pytomography.device, dtype=pytomography.dtype)
+    tensor_pinned = torch.empty(tensor.shape, dtype=pytomography.dtype, pin_memory=True)
+    tensor_pinned.copy_(tensor)
+    return tensor_pinned.to(pytomography.device, non_blocking=True)
+
+def _ensure_layout(tensor: torch.Tensor) -> torch.Tensor:
+    """Returns a tensor in the canonical layout of PyTomography: C-contiguous, with strides decreasing from the first to the last dimension (so the last dimension, usually z, is contiguous in memory). Tensors produced by ``permute``/``flip`` are copied once; tensors already in this layout are returned as is.
+
+    Args:
+        tensor (torch.Tensor): Tensor.
+
+    Returns:
+        torch.Tensor: Tensor in the canonical layout.
+    """
+    return tensor.contiguous(memory_format=torch.contiguous_format)
+
+# scipy.ndimage boundary modes that have an equivalent padding mode in grid_sample
+_GRID_SAMPLE_PADDING_MODES = {'constant': 'zeros', 'nearest': 'border', 'mirror': 'reflection'}
+
+def _affine_transform(
+    array: np.array,
+    M: np.array,
+    output_shape: Sequence[int],
+    mode: str = 'constant',
+    cval: float = 0,
+    order: int = 3,
+) -> torch.Tensor:
+    """Equivalent of ``scipy.ndimage.affine_transform`` that returns a tensor on ``pytomography.device``. When the device is a GPU, resampling is performed there using ``grid_sample``; in this case only trilinear (``order>0``) and nearest neighbour (``order=0``) interpolation are available. Otherwise (or if ``mode`` has no ``grid_sample`` equivalent) scipy is used.
+
+    Args:
+        array (np.array): Array to resample.
+        M (np.array): (4,4) affine matrix mapping output voxel indices to input voxel indices.
+        output_shape (Sequence[int]): Shape of the output.
+        mode (str, optional): How points outside the input are handled (see ``scipy.ndimage.affine_transform``). Defaults to 'constant'.
+        cval (float, optional): Value used outside the input when ``mode='constant'``. Defaults to 0.
+        order (int, optional): Order of the interpolation. Defaults to 3.
+
+    Returns:
+        torch.Tensor: Resampled array.
+    """
+    if torch.device(pytomography.device).type != 'cuda' or mode not in _GRID_SAMPLE_PADDING_MODES:
+        return _array_to_device(
+            affine_transform(array, M, output_shape=output_shape, mode=mode, cval=cval, order=order)
+        )
+    # grid_sample pads with zeros, so shift such that cval -> 0
+    input = _array_to_device(array)[None, None] - cval
+    input_half_width = np.maximum(np.array(array.shape) - 1, 1) / 2
+    output_half_width = (np.array(output_shape) - 1) / 2
+    # Convert M to map between normalized coordinates (-1 and 1 are the centres of the first and last voxels)
+    normalize_output = np.eye(4)
+    normalize_output[:3, :3] = np.diag(output_half_width)
+    normalize_output[:3, 3] = output_half_width
+    normalize_input = np.eye(4)
+    normalize_input[:3, :3] = np.diag(1 / input_half_width)
+    normalize_input[:3, 3] = -1
+    theta = normalize_input @ M @ normalize_output
+    # grid_sample coordinates (x,y,z) correspond to the last, middle, and first axes
+    permutation = [2, 1, 0, 3]
+    theta = theta[permutation][:, permutation][:3]
+    theta = torch.tensor(theta, dtype=input.dtype, device=input.device).unsqueeze(0)
+    grid = affine_grid(theta, (1, 1, *output_shape), align_corners=True)
+    output = grid_sample(
+        input,
+        grid,
+        mode='bilinear' if order > 0 else 'nearest',
+        padding_mode=_GRID_SAMPLE_PADDING_MODES[mode],
+        align_corners=True,
+    )
+    return output[0, 0] + cval
+
+def _get_affine_z_flip(Lz: int) -> np.array:
+    """Computes the affine matrix that maps the z index :math:`k` to :math:`L_z-1-k`. Composing this with the matrix of ``_affine_transform`` is equivalent to flipping the input (on the left) or output (on the right) along z, without copying the array.
+
+    Args:
+        Lz (int): Number of voxels along z.
+
+    Returns:
+        np.array: Affine matrix
+    """
+    M = np.eye(4)
+    M[2, 2] = -1
+    M[2, 3] = Lz - 1
+    return M
+
+@functools.lru_cache(maxsize=8)
+def _read_ds_cached(path: str, mtime: float, stop_before_pixels: bool) -> Dataset:
+    return pydicom.dcmread(path, force=True, stop_before_pixels=stop_before_pixels)
+
+def _read_ds(file: str, stop_before_pixels: bool = False) -> Dataset:
+    """Reads a DICOM file. Results are cached on the file path and modification time so that functions using the same file (such as reading projections and then scatter windows) only parse it once.
+
+    Callers must not modify the returned dataset or its ``pixel_array`` (including through tensors that share memory with it, such as those returned by ``torch.from_numpy``): the same objects are returned to every later caller reading the same file. Copy the data before any in-place operation.
+
+    Args:
+        file (str): Path to the DICOM file.
+        stop_before_pixels (bool): If True, only the header is read. This is much faster for large files when only metadata is required. Defaults to False.
+
+    Returns:
+        Dataset: DICOM dataset.
+    """
+    path = os.path.abspath(file)
+    return _read_ds_cached(path, os.path.getmtime(path), stop_before_pixels)
+
 def parse_projection_dataset(
     ds: Dataset,
+    energy_window_indices: Sequence[int] | None = None,
 ) -> Sequence[torch.Tensor, np.array, np.array, dict]:
     """Gets projections with corresponding radii and angles corresponding to projection data from a DICOM file.
 
     Args:
         ds (Dataset): pydicom dataset object.
+        energy_window_indices (Sequence[int] | None): If not None, only these energy windows are extracted from the pixel data (in the given order). Otherwise all energy windows are returned. Defaults to None.
 
     Returns:
-        (torch.tensor[EWindows, TimeWindows, Ltheta, Lr, Lz], np.array, np.array): Returns (i) projection data (ii) angles (iii) radii and (iv) flags for whether or not multiple energy windows/time slots were detected.
+        (torch.tensor[EWindows, TimeWindows, Ltheta, Lr, Lz], np.array, np.array): Returns (i) projection data (C-contiguous, so Lz has unit stride) (ii) angles (iii) radii and (iv) flags for whether or not multiple energy windows/time slots were detected.
     """
     flags = {"multi_energy_window": False, "multi_time_slot": False}
     pixel_array = ds.pixel_array
@@ -58,25 +181,22 @@ def parse_projection_dataset(
     if len(np.unique(time_slot_vector)) > 1:
         flags["multi_time_slot"] = True
     # Get radii and angles
-    detectors = np.array(ds.DetectorVector)
-    radii = np.array([])
-    angles = np.array([])
-    for detector in np.unique(detectors):
-        n_angles = ds.RotationInformationSequence[0].NumberOfFramesInRotation
-        delta_angle = ds.RotationInformationSequence[0].AngularStep
+    rotation_information = ds.RotationInformationSequence[0]
+    n_angles = rotation_information.NumberOfFramesInRotation
+    delta_angle = rotation_information.AngularStep
+    rotation_direction = rotation_information.RotationDirection
+    angle_sign = 1 if rotation_direction in ("CC", "CCW") else -1
+    unique_detectors = np.unique(detector_vector)
+    angles = np.empty(len(unique_detectors) * n_angles)
+    radii = np.empty(len(unique_detectors) * n_angles)
+    for i, detector in enumerate(unique_detectors):
         try:
             start_angle = ds.DetectorInformationSequence[detector - 1].StartAngle
         except:
-            start_angle = ds.RotationInformationSequence[0].StartAngle
-        rotation_direction = ds.RotationInformationSequence[0].RotationDirection
-        if rotation_direction == "CC" or rotation_direction == "CCW":
-            angles = np.concatenate(
-                [angles, start_angle + delta_angle * np.arange(n_angles)]
-            )
-        else:
-            angles = np.concatenate(
-                [angles, start_angle - delta_angle * np.arange(n_angles)]
-            )
+            start_angle = rotation_information.StartAngle
+        angles[i * n_angles : (i + 1) * n_angles] = (
+            start_angle + angle_sign * delta_angle * np.arange(n_angles)
+        )
         try:
             radial_positions_detector = ds.DetectorInformationSequence[
                 detector - 1
@@ -85,28 +205,30 @@ def parse_projection_dataset(
             radial_positions_detector = ds.RotationInformationSequence[
                 detector - 1
             ].RadialPosition
-        if not isinstance(radial_positions_detector, collections.abc.Sequence):
-            radial_positions_detector = n_angles * [radial_positions_detector]
-        radii = np.concatenate([radii, radial_positions_detector])
-    projections = []
-    for energy_window in np.unique(energy_window_vector):
-        t_slot_projections = []
-        for time_slot in np.unique(time_slot_vector):
-            pixel_array_i = pixel_array[
-                (time_slot_vector == time_slot)
-                * (energy_window_vector == energy_window)
-            ]
-            t_slot_projections.append(pixel_array_i)
-        projections.append(t_slot_projections)
-    projections = np.array(projections)
+        # A single radial position is broadcast to all angles
+        radii[i * n_angles : (i + 1) * n_angles] = radial_positions_detector
+    # Boolean masks of shape [N_frames, N_unique] computed once for all energy windows / time slots
+    energy_window_masks = energy_window_vector[:, None] == np.unique(energy_window_vector)[None, :]
+    time_slot_masks = time_slot_vector[:, None] == np.unique(time_slot_vector)[None, :]
+    if energy_window_indices is not None:
+        energy_window_masks = energy_window_masks[:, list(energy_window_indices)]
+        flags["multi_energy_window"] = len(energy_window_indices) > 1
+    projections = np.stack([
+        np.stack([
+            pixel_array[energy_window_masks[:, e] & time_slot_masks[:, t]]
+            for t in range(time_slot_masks.shape[1])
+        ])
+        for e in range(energy_window_masks.shape[1])
+    ])
 
     angles = (angles + 180) % 360  # to detector angle convention
     sorted_idxs = np.argsort(angles)
-    projections = np.transpose(
-        projections[:, :, sorted_idxs, ::-1], (0, 1, 2, 4, 3)
-    ).astype(np.float32)
-    projections = (
-        torch.tensor(projections.copy()).to(pytomography.dtype).to(pytomography.device)
+    # Sorting, flipping and transposing is done after upload: on the device these are cheap compared to numpy copies
+    projections = _array_to_device(projections)
+    projections = _ensure_layout(
+        projections.index_select(2, torch.as_tensor(sorted_idxs, device=projections.device))
+        .flip(-2)
+        .permute(0, 1, 2, 4, 3)
     )
     return (projections, angles[sorted_idxs], radii[sorted_idxs] / 10, flags)
 
@@ -123,7 +245,7 @@ def get_metadata(
     Returns:
         (ObjectMeta, ProjMeta): Required metadata information for reconstruction in PyTomography.
     """
-    ds = pydicom.read_file(file, force=True)
+    ds = _read_ds(file)
     dx = ds.PixelSpacing[0] / 10
     dz = ds.PixelSpacing[1] / 10
     dr = (dx, dx, dz)
@@ -152,11 +274,20 @@ def get_projections(
     Returns:
         (SPECTObjectMeta, SPECTProjMeta, torch.Tensor[..., Ltheta, Lr, Lz]) where ... depends on if time slots are considered.
     """
-    ds = pydicom.read_file(file, force=True)
-    projections, _, _, flags = parse_projection_dataset(ds)
+    return _get_projections_from_ds(_read_ds(file), index_peak, index_time)
+
+
+def _get_projections_from_ds(
+    ds: Dataset,
+    index_peak: None | int = None,
+    index_time: None | int = None,
+    energy_window_indices: Sequence[int] | None = None,
+) -> torch.Tensor:
+    """Gets projections from an already opened DICOM dataset; see ``get_projections``. If ``energy_window_indices`` is given, only those energy windows are loaded."""
     if index_peak is not None:
-        projections = projections[index_peak].unsqueeze(dim=0)
-        flags["multi_energy_window"] = False
+        # Only load the requested energy window
+        energy_window_indices = [index_peak]
+    projections, _, _, flags = parse_projection_dataset(ds, energy_window_indices)
     if index_time is not None:
         projections = projections[:, index_time].unsqueeze(dim=1)
         flags["multi_time_slot"] = False
@@ -208,8 +339,12 @@ def get_scatter_from_TEW(
     Returns:
         torch.Tensor[1,Ltheta,Lr,Lz]: Tensor corresponding to the scatter estimate.
     """
-    projections_all = get_projections(file).to(pytomography.device)
-    return get_scatter_from_TEW_projections(file, projections_all, index_peak, index_lower, index_upper, return_scatter_variance_estimate)
+    ds = _read_ds(file)
+    # Only the lower and upper windows are required from the pixel data
+    projections_lower, projections_upper = _get_projections_from_ds(
+        ds, energy_window_indices=[index_lower, index_upper]
+    ).to(pytomography.device)
+    return _get_scatter_from_TEW_ds(ds, projections_lower, projections_upper, index_peak, index_lower, index_upper, return_scatter_variance_estimate)
 
 def get_scatter_from_TEW_projections(
     file: str, projections: torch.Tensor, index_peak: int, index_lower: int, index_upper: int, return_scatter_variance_estimate=False
@@ -226,13 +361,18 @@ def get_scatter_from_TEW_projections(
     Returns:
         torch.Tensor[1,Ltheta,Lr,Lz]: Tensor corresponding to the scatter estimate.
     """
-    ds = pydicom.read_file(file, force=True)
+    return _get_scatter_from_TEW_ds(_read_ds(file, stop_before_pixels=True), projections[index_lower], projections[index_upper], index_peak, index_lower, index_upper, return_scatter_variance_estimate)
+
+def _get_scatter_from_TEW_ds(
+    ds: Dataset, projections_lower: torch.Tensor, projections_upper: torch.Tensor, index_peak: int, index_lower: int, index_upper: int, return_scatter_variance_estimate=False
+) -> torch.Tensor:
+    """Computes the triple energy window scatter estimate from the lower/upper window projections, using the energy window widths of an already opened DICOM dataset; see ``get_scatter_from_TEW_projections``."""
     ww_peak = get_window_width(ds, index_peak)
     ww_lower = get_window_width(ds, index_lower)
     ww_upper = get_window_width(ds, index_upper)
     scatter = compute_TEW(
-        projections[index_lower].unsqueeze(0),
-        projections[index_upper].unsqueeze(0),
+        projections_lower.unsqueeze(0),
+        projections_upper.unsqueeze(0),
         ww_lower,
         ww_upper,
         ww_peak,
@@ -248,23 +388,50 @@ def get_attenuation_map_from_file(file_AM: str) -> torch.Tensor:
         file_AM (str): File name of attenuation map
 
     Returns:
-        torch.Tensor: Tensor of shape [batch_size, Lx, Ly, Lz] corresponding to the atteunation map in units of cm:math:`^{-1}`
+        torch.Tensor: Tensor of shape [batch_size, Lx, Ly, Lz] (C-contiguous) corresponding to the atteunation map in units of cm:math:`^{-1}`
     """
-    ds = pydicom.read_file(file_AM, force=True)
+    ds = _read_ds(file_AM)
     # DICOM header for scale factor that shows up sometimes
     if (0x033, 0x1038) in ds:
         scale_factor = 1 / ds[0x033, 0x1038].value
     else:
         scale_factor = 1
-    attenuation_map = ds.pixel_array * scale_factor
+    # Scale and transpose on the device rather than in float64 on the host. Scaled out of place: on the CPU the tensor may share memory with the (cached) pixel array
+    attenuation_map = _array_to_device(ds.pixel_array) * scale_factor
+    return _ensure_layout(attenuation_map.permute(2, 1, 0).unsqueeze(dim=0))
 
-    return (
-        torch.tensor(np.transpose(attenuation_map, (2, 1, 0)))
-        .unsqueeze(dim=0)
-        .to(pytomography.dtype)
-        .to(pytomography.device)
-    )
 
+def _sigma_fit_parallel_hole(r: np.array, a: float, b: float, c: float) -> np.array:
+    """PSF width of a parallel hole collimator: linear collimator component :math:`ar+b` added in quadrature with the intrinsic resolution :math:`c`.
+
+    Args:
+        r (np.array): Distances from the detector.
+        a (float): Collimator slope.
+        b (float): Collimator intercept.
+        c (float): Intrinsic resolution.
+
+    Returns:
+        np.array: Standard deviation of the PSF at each distance.
+    """
+    return np.hypot(a*r + b, c)
+
+@functools.lru_cache(maxsize=None)
+def _load_collimator_table() -> dict[str, tuple[float, float]]:
+    """Loads the collimator database (obtained from SIMIND) once.
+
+    Returns:
+        dict[str, tuple[float, float]]: Hole diameter and hole length (in cm) of each collimator, keyed by collimator code.
+    """
+    module_path = os.path.dirname(os.path.abspath(__file__))
+    collimator_filepath = os.path.join(module_path, "../../data/collim.col")
+    collimator_table = {}
+    with open(collimator_filepath) as f:
+        for line in f:
+            # A valid record starts with the character '*', all other lines are comments
+            if line.startswith('*'):
+                entries = line.split()
+                collimator_table[entries[0][1:]] = (float(entries[1]), float(entries[3]))
+    return collimator_table
 
 def get_psfmeta_from_scanner_params(
     collimator_name: str,
@@ -287,20 +454,18 @@ def get_psfmeta_from_scanner_params(
     """
 
     module_path = os.path.dirname(os.path.abspath(__file__))
-    collimator_filepath = os.path.join(module_path, "../../data/collim.col")
-    with open(collimator_filepath) as f:
-        collimator_data = f.readlines()
-    collimator_data = np.array(collimator_data)
-    try:
-        line = collimator_data[np.char.find(collimator_data, collimator_name) >= 0][0]
-    except:
-        Exception(
-            f"Cannot find data for collimator name {collimator_name}. For a list of available collimator names, run `from pytomography.utils import print_collimator_parameters` and then `print_collimator_parameters()`."
-        )
+    collimator_table = _load_collimator_table()
+    if collimator_name not in collimator_table:
+        # Partial collimator codes are matched to the first available collimator
+        matches = [name for name in collimator_table if collimator_name in name]
+        if len(matches) == 0:
+            raise KeyError(
+                f"Cannot find data for collimator name {collimator_name}. For a list of available collimator names, run `from pytomography.utils import print_collimator_parameters` and then `print_collimator_parameters()`."
+            )
+        collimator_name = matches[0]
 
     # TODO: Support for other collimator types. Right now just parallel hole
-    hole_length = float(line.split()[3])
-    hole_diameter = float(line.split()[1])
+    hole_diameter, hole_length = collimator_table[collimator_name]
 
     lead_attenuation = get_mu_from_spectrum_interp(os.path.join(module_path, f'../../data/NIST_attenuation_data/{material}.csv'), energy_keV)
     
@@ -309,12 +474,11 @@ def get_psfmeta_from_scanner_params(
     collimator_intercept = hole_diameter * FWHM2sigma
     intrinsic_resolution = intrinsic_resolution * FWHM2sigma
     
-    sigma_fit = lambda r, a, b, c: np.sqrt((a*r+b)**2+c**2)
     sigma_fit_params = [collimator_slope, collimator_intercept, intrinsic_resolution]
     
     return SPECTPSFMeta(
         sigma_fit_params=sigma_fit_params,
-        sigma_fit=sigma_fit,
+        sigma_fit=_sigma_fit_parallel_hole,
         min_sigmas=min_sigmas
         )
 
@@ -325,7 +489,7 @@ def CT_to_mumap(
     """Converts a CT image to a mu-map given SPECT projection data. The CT data must be aligned with the projection data already; this is a helper function for ``get_attenuation_map_from_CT_slices``.
 
     Args:
-        CT (torch.tensor): CT object in units of HU
+        CT (torch.tensor | np.array): CT object in units of HU
         files_CT (Sequence[str]): Filepaths of all CT slices
         file_NM (str): Filepath of SPECT projectio ndata
         index_peak (int, optional): Index of EnergyInformationSequence corresponding to the photopeak. Defaults to 0.
@@ -333,7 +497,7 @@ def CT_to_mumap(
     Returns:
         torch.tensor: Attenuation map in units of 1/cm
     """
-    ds_NM = pydicom.read_file(file_NM)
+    ds_NM = _read_ds(file_NM, stop_before_pixels=True)
     window_upper = (
         ds_NM.EnergyWindowInformationSequence[index_peak]
         .EnergyWindowRangeSequence[0]
@@ -345,7 +509,7 @@ def CT_to_mumap(
         .EnergyWindowLowerLimit
     )
     E_SPECT = (window_lower + window_upper) / 2
-    KVP = pydicom.read_file(files_CT[0]).KVP
+    KVP = pydicom.dcmread(files_CT[0], stop_before_pixels=True).KVP
     HU2mu_conversion = get_HU2mu_conversion(files_CT, KVP, E_SPECT)
     return HU2mu_conversion(CT)
 
@@ -370,19 +534,14 @@ def get_attenuation_map_from_CT_slices(
         apply_affine (bool): Whether or not to align CT with NM.
 
     Returns:
-        torch.Tensor: Tensor of shape [Lx, Ly, Lz] corresponding to attenuation map.
+        torch.Tensor: Tensor of shape [1, Lx, Ly, Lz] (C-contiguous) corresponding to attenuation map.
     """
 
     CT_HU = open_multifile(files_CT)
 
     if file_NM is None:
-        return (
-            torch.tensor(CT_HU.copy())
-            .unsqueeze(dim=0)
-            .to(pytomography.dtype)
-            .to(pytomography.device)
-        )
-    ds_NM = pydicom.read_file(file_NM)
+        return _ensure_layout(_array_to_device(CT_HU).unsqueeze(dim=0))
+    ds_NM = _read_ds(file_NM, stop_before_pixels=True)
     # When doing affine transform, fill outside with point below -1000HU so it automatically gets converted to mu=0 after bilinear transform
     if CT_output_shape is None:
         CT_output_shape = (ds_NM.Rows, ds_NM.Rows, ds_NM.Columns)
@@ -390,35 +549,37 @@ def get_attenuation_map_from_CT_slices(
         # Align with SPECT:
         M_CT = _get_affine_multifile(files_CT)
         M_NM = _get_affine_spect_projections(file_NM)
-        # Resample CT and convert to mu at 208keV and save
-        M = npl.inv(M_CT) @ M_NM
-        CT_HU = affine_transform(
-            CT_HU[:,:,::-1], M, output_shape=CT_output_shape, mode=mode, cval=-1500
+        # Resample CT and convert to mu at 208keV and save. The z flips of the input and output are included in the affine matrix
+        M = _get_affine_z_flip(CT_HU.shape[-1]) @ npl.inv(M_CT) @ M_NM @ _get_affine_z_flip(CT_output_shape[-1])
+        CT_HU = _affine_transform(
+            CT_HU, M, output_shape=CT_output_shape, mode=mode, cval=-1500
         )
+    else:
+        CT_HU = _array_to_device(CT_HU).flip(-1)
     if keep_as_HU:
         CT = CT_HU
     else:
         CT = CT_to_mumap(CT_HU, files_CT, file_NM, index_peak)
-    CT = (
-        torch.tensor(CT[:, :, ::-1].copy())
-        .unsqueeze(dim=0)
-        .to(pytomography.dtype)
-        .to(pytomography.device)
-    )
-    return CT
+    return _ensure_layout(CT.unsqueeze(dim=0))
 
 
 def _get_affine_spect_projections(filename: str) -> np.array:
     """Computes an affine matrix corresponding the coordinate system of a SPECT DICOM file of projections.
 
     Args:
-        ds (Dataset): DICOM dataset of projection data
+        filename (str): Filepath of the DICOM file of projection data
 
     Returns:
         np.array: Affine matrix
     """
+    path = os.path.abspath(filename)
+    # Copy, since the cached matrix is shared between callers
+    return _get_affine_spect_projections_cached(path, os.path.getmtime(path)).copy()
+
+@functools.lru_cache(maxsize=32)
+def _get_affine_spect_projections_cached(path: str, mtime: float) -> np.array:
     # Note: per DICOM convention z actually decreases as the z-index increases (initial z slices start with the head)
-    ds = pydicom.read_file(filename)
+    ds = _read_ds(path, stop_before_pixels=True)
     Sx, Sy, Sz = ds.DetectorInformationSequence[0].ImagePositionPatient
     dx = dy = ds.PixelSpacing[0]
     dz = ds.PixelSpacing[1]
@@ -429,53 +590,13 @@ def _get_affine_spect_projections(filename: str) -> np.array:
     # Difference between Siemens and GE
     # if ds.Manufacturer=='GE MEDICAL SYSTEMS':
     #Sz -= ds.RotationInformationSequence[0].TableTraverse
-    M = np.zeros((4, 4))
-    M[0] = np.array([dx, 0, 0, Sx])
-    M[1] = np.array([0, dy, 0, Sy])
-    M[2] = np.array([0, 0, -dz, Sz])
-    M[3] = np.array([0, 0, 0, 1])
+    M = np.eye(4)
+    M[0, 0] = dx
+    M[1, 1] = dy
+    M[2, 2] = -dz
+    M[:3, 3] = (Sx, Sy, Sz)
     return M
 
-def load_multibed_projections(
-    files_NM: str,
-    index_lower: int = 20,
-    index_upper: int = 106,
-) -> torch.Tensor:
-    """This function loads projection data from each of the files in files_NM; for locations outside the FOV in each projection, it appends the data from the adjacent projection. The field of view (in z) is specified by ``index_lower`` and ``index_upper``. The default values of 20 and 106 seem to be sufficient for most scanners.
-
-    Args:
-        files_NM (str): Filespaths for each of the projections
-        index_lower (int, optional): Z-pixel index specifying the lower boundary of the FOV. Defaults to 20.
-        index_upper (int, optional): Z-pixel index specifying the upper boundary of the FOV. Defaults to 106.
-
-    Returns:
-        torch.Tensor: Tensor of shape ``[N_bed_positions, N_energy_windows, Ltheta, Lr, Lz]``.
-    """
-    projectionss = torch.stack([get_projections(file_NM) for file_NM in files_NM])
-    dss = np.array([pydicom.read_file(file_NM) for file_NM in files_NM])
-    zs = torch.tensor(
-        [ds.DetectorInformationSequence[0].ImagePositionPatient[-1] for ds in dss]
-    )
-    # Sort by increasing z-position
-    order = torch.argsort(zs)
-    dss = dss[order.cpu().numpy()]
-    zs = zs[order]
-    zs = torch.round((zs - zs[0]) / dss[0].PixelSpacing[1]).to(torch.long)
-    projectionss = projectionss[order]
-    z_voxels = projectionss[0].shape[-1]
-    projectionss_combined = torch.stack([p for p in projectionss])
-    for i in range(len(projectionss)):
-        if i>0:
-            diff = zs[i] - zs[i-1]
-            # Assumes the projections overlap slightly
-            projectionss_combined[i][...,:index_lower] = projectionss[i-1][...,diff:diff+index_lower]
-        if i<len(projectionss)-1:
-            diff = zs[i+1] - zs[i]
-            # Assumes the projections overlap slightly
-            projectionss_combined[i][...,index_upper:z_voxels] = projectionss[i+1][...,index_upper-diff:z_voxels-diff]
-    # Return back in original order of files_NM
-    return projectionss_combined[torch.argsort(order)]
-
 def load_multibed_projections(
     files_NM: str,
 ) -> torch.Tensor:
@@ -487,32 +608,36 @@ def load_multibed_projections(
     Returns:
         torch.Tensor: Tensor of shape ``[N_bed_positions, N_energy_windows, Ltheta, Lr, Lz]``.
     """
-    projectionss = torch.stack([get_projections(file_NM) for file_NM in files_NM])
-    dss = np.array([pydicom.read_file(file_NM) for file_NM in files_NM])
+    dss = _map_parallel(_read_ds, files_NM)
+    projectionss = torch.stack(_map_parallel(_get_projections_from_ds, dss))
+    device = projectionss.device
     zs = torch.tensor(
-        [ds.DetectorInformationSequence[0].ImagePositionPatient[-1] for ds in dss]
+        [ds.DetectorInformationSequence[0].ImagePositionPatient[-1] for ds in dss], device=device
     )
     # Sort by increasing z-position
     order = torch.argsort(zs)
-    dss = dss[order.cpu().numpy()]
     zs = zs[order]
-    zs = torch.round((zs - zs[0]) / dss[0].PixelSpacing[1]).to(torch.long)
-    projectionss = projectionss[order]
-    z_voxels = projectionss[0].shape[-1]
-    projectionss_combined = torch.stack([p for p in projectionss])
-    for i in range(len(projectionss)):
-        if i>0: # Set lower part
-            dz = zs[i] - zs[i-1]
-            index_midway = int((z_voxels - dz)/2)
-            # Assumes the projections overlap slightly
-            projectionss_combined[i][...,:index_midway] = projectionss[i-1][...,dz:dz+index_midway]
-        if i<len(projectionss)-1: # Set upper part
-            dz = zs[i+1] - zs[i]
-            index_midway = int((z_voxels - dz)/2)
-            # Assumes the projections overlap slightly
-            projectionss_combined[i][...,dz+index_midway:] = projectionss[i+1][...,index_midway:z_voxels-dz]
-    # Return back in original order of files_NM
-    return projectionss_combined[torch.argsort(order)]
+    zs = torch.round((zs - zs[0]) / dss[order[0]].PixelSpacing[1]).to(torch.long)
+    n_beds = len(projectionss)
+    z_voxels = projectionss.shape[-1]
+    bed = torch.arange(n_beds, device=device)[:, None]
+    z = torch.arange(z_voxels, device=device)
+    # Offsets to the (sorted) bed positions below and above
+    zero = torch.zeros(1, dtype=torch.long, device=device)
+    dz_below = torch.cat([zero, zs[1:] - zs[:-1]])[:, None]
+    dz_above = torch.cat([zs[1:] - zs[:-1], zero])[:, None]
+    # Assumes the projections overlap slightly; outside the midway point of the overlap, the adjacent bed position is used
+    lower = (bed > 0) & (z < torch.div(z_voxels - dz_below, 2, rounding_mode='trunc'))
+    upper = (bed < n_beds - 1) & (z >= dz_above + torch.div(z_voxels - dz_above, 2, rounding_mode='trunc'))
+    source_bed = torch.where(upper, bed + 1, torch.where(lower, bed - 1, bed))
+    source_z = torch.where(upper, z - dz_above, torch.where(lower, z + dz_below, z))
+    # Return back in original order of files_NM: gather every z slice from its source in one indexing operation
+    inverse_order = torch.empty_like(order)
+    inverse_order[order] = torch.arange(n_beds, device=device)
+    projectionss_combined = projectionss.movedim(-1, 1)[
+        order[source_bed[inverse_order]], source_z[inverse_order]
+    ]
+    return projectionss_combined.movedim(1, -1).contiguous()
 
 def stitch_multibed(
     recons: torch.Tensor,
@@ -529,47 +654,51 @@ def stitch_multibed(
     Returns:
         torch.Tensor[1, Lx, Ly, Lz']: Stitched together DICOM file. Note the new z-dimension size :math:`L_z'`.
     """
-    dss = np.array([pydicom.read_file(file_NM) for file_NM in files_NM])
+    dss = [_read_ds(file_NM, stop_before_pixels=True) for file_NM in files_NM]
     zs = np.array(
         [ds.DetectorInformationSequence[0].ImagePositionPatient[-1] for ds in dss]
     )
     # Sort by increasing z-position
     order = np.argsort(zs)
-    dss = dss[order]
+    ds_lowest = dss[order[0]]
     zs = zs[order]
     recons = recons[order]
     # convert to voxel height
-    zs = np.round((zs - zs[0]) / dss[0].PixelSpacing[1]).astype(int)
+    zs = np.round((zs - zs[0]) / ds_lowest.PixelSpacing[1]).astype(int)
     original_z_height = recons.shape[-1]
     new_z_height = zs[-1] + original_z_height
-    recon_aligned = torch.zeros((1, dss[0].Rows, dss[0].Rows, new_z_height)).to(
-        pytomography.device
+    recon_aligned = torch.zeros(
+        (1, ds_lowest.Rows, ds_lowest.Rows, new_z_height), device=pytomography.device
     )
     blank_below, blank_above = get_blank_below_above(get_projections(files_NM[0]))
     # Ignore first two slices
     blank_below +=1
     blank_above -=1
-    # Apply stitching method
-    stitching_weights = []
-    for i in range(len(recons)):
-        stitching_weights_i = torch.zeros(1,*recons.shape[1:]).to(pytomography.device)
-        stitching_weights_i[:,:,:,blank_below:blank_above] = 1
-        stitching_weights.append(stitching_weights_i)
-    for i in range(len(recons)):
-        # stitching from above
-        if i!=len(recons)-1:
-            overlap_lower = zs[i+1] - zs[i] + blank_below
-            overlap_upper = blank_above
-            delta = overlap_upper - overlap_lower
-            # Only offer midslice stitch now because TEM messes with uncertainty estimation
-            half = round(delta / 2)
-            stitching_weights[i][:,:,:,overlap_lower+half:overlap_lower+delta] = 0
-            stitching_weights[i+1][:,:,:,blank_below:blank_below+half] = 0
-    for i in range(len(zs)):
-        recon_aligned[:, :, :, zs[i] : zs[i] + original_z_height] += recons[i].unsqueeze(0)  * stitching_weights[i]
+    # Apply stitching method: each bed position contributes z slices [lower, upper)
+    n_beds = len(recons)
+    lower = np.full(n_beds, blank_below)
+    upper = np.full(n_beds, blank_above)
+    # stitching from above
+    overlap_lower = zs[1:] - zs[:-1] + blank_below
+    overlap_upper = blank_above
+    delta = overlap_upper - overlap_lower
+    # Only offer midslice stitch now because TEM messes with uncertainty estimation
+    half = np.round(delta / 2).astype(int)
+    upper[:-1] = np.minimum(upper[:-1], overlap_lower + half)
+    lower[1:] = np.maximum(lower[1:], blank_below + half)
+    z_indices = torch.arange(original_z_height, device=pytomography.device)
+    bounds = torch.tensor(np.stack([lower, upper]), device=pytomography.device)
+    stitching_weights = ((z_indices >= bounds[0, :, None]) & (z_indices < bounds[1, :, None])).to(recon_aligned.dtype)
+    stitching_weights = stitching_weights[:, None, None].expand(recons.shape)
+    # Sum all bed positions into the stitched image in one call
+    index_aligned = (torch.tensor(zs, device=pytomography.device)[:, None] + z_indices).ravel()
+    recons_weighted = (recons.to(pytomography.device, recon_aligned.dtype) * stitching_weights).permute(1, 2, 0, 3)
+    recon_aligned[0].index_add_(-1, index_aligned, recons_weighted.reshape(*recons.shape[1:3], -1))
     if return_stitching_weights:
         # put back in original order
-        return torch.cat(stitching_weights)[np.argsort(order)], zs[np.argsort(order)]
+        inverse_order = np.empty_like(order)
+        inverse_order[order] = np.arange(n_beds)
+        return stitching_weights.contiguous()[inverse_order], zs[inverse_order]
     else:
         return recon_aligned
 
@@ -604,12 +733,13 @@ def get_aligned_rtstruct(
     mask = rtstruct.get_roi_mask_by_name(rt_struct_name).astype(float)
     M_CT = _get_affine_multifile(files_CT)
     M_NM = _get_affine_spect_projections(file_NM)
-    M = npl.inv(M_CT) @ M_NM
-    mask_aligned = affine_transform(mask.transpose((1,0,2))[:,:,::-1], M, output_shape=shape, mode='constant', cval=0, order=1)[:,:,::-1]
+    # The z flips of the input and output are included in the affine matrix
+    M = _get_affine_z_flip(mask.shape[-1]) @ npl.inv(M_CT) @ M_NM @ _get_affine_z_flip(shape[-1])
+    mask_aligned = _affine_transform(mask.transpose((1,0,2)), M, output_shape=shape, mode='constant', cval=0, order=1)
     if cutoff_value is None:
-        return torch.tensor(mask_aligned.copy()).to(pytomography.device).unsqueeze(0)
+        return mask_aligned.unsqueeze(0)
     else:
-        return torch.tensor(mask_aligned>cutoff_value).to(pytomography.device).unsqueeze(0)
+        return (mask_aligned>cutoff_value).unsqueeze(0)
 
 def get_aligned_nifti_mask(
     file_nifti: str,
@@ -638,10 +768,29 @@ def get_aligned_nifti_mask(
     files_CT = [os.path.join(dicom_series_path, file) for file in os.listdir(dicom_series_path)]
     M_CT = _get_affine_multifile(files_CT)
     M_NM = _get_affine_spect_projections(file_NM)
-    M = npl.inv(M_CT) @ M_NM
-    mask_aligned = affine_transform(mask.transpose((1,0,2))[:,:,::-1], M, output_shape=shape, mode='constant', cval=0, order=1)[:,:,::-1]
-    return torch.tensor(mask_aligned>cutoff_value).to(pytomography.device).unsqueeze(0)
+    # The z flips of the input and output are included in the affine matrix
+    M = _get_affine_z_flip(mask.shape[-1]) @ npl.inv(M_CT) @ M_NM @ _get_affine_z_flip(shape[-1])
+    mask_aligned = _affine_transform(mask.transpose((1,0,2)), M, output_shape=shape, mode='constant', cval=0, order=1)
+    return (mask_aligned>cutoff_value).unsqueeze(0)
+
+
+def _copy_slice_dataset(ds: FileDataset) -> FileDataset:
+    """Copies a dataset for an individual slice of a multi-slice DICOM series. Unlike ``copy.deepcopy``, each data element is copied shallowly: assigning a tag on the copy (which pydicom does in place on an existing element) leaves ``ds`` and other copies unchanged, while element values are shared. The file meta information, which is modified for every slice, is deep copied.
 
+    Args:
+        ds (FileDataset): Dataset to copy.
+
+    Returns:
+        FileDataset: Copied dataset.
+    """
+    return FileDataset(
+        ds.filename,
+        {tag: copy.copy(elem) for tag, elem in ds.items()},
+        preamble=ds.preamble,
+        file_meta=copy.deepcopy(ds.file_meta),
+        is_implicit_VR=ds.is_implicit_VR,
+        is_little_endian=ds.is_little_endian,
+    )
 
 def save_dcm(
     save_path: str,
@@ -678,15 +827,19 @@ def save_dcm(
         SOP_class_UID = "1.2.840.10008.5.1.4.1.1.128"  # SPECT storage
         modality = 'PT'
     ds = create_ds(ds_NM, SOP_instance_UID, SOP_class_UID, modality)
-    pixel_data = torch.permute(object.squeeze(),(2,1,0)).cpu().numpy()
+    pixel_data = torch.permute(object.squeeze(),(2,1,0))
     if scale_by_number_projections:
         scale_factor = get_metadata(file_NM)[1].num_projections
         ds.RescaleSlope = 1
     else:
-        scale_factor = (2**16 - 1) / pixel_data.max()
+        # Single scalar copied to the host; an empty reconstruction would otherwise give an infinite scale factor
+        max_value = pixel_data.max().item()
+        scale_factor = (2**16 - 1) / max_value if max_value > 0 else 1
         ds.RescaleSlope = 1/scale_factor
-    pixel_data *= scale_factor #maximum dynamic range
-    pixel_data = pixel_data.round().astype(np.uint16)
+    # Scale (maximum dynamic range), round and quantize on the device so that only 16 bit data is copied to the host.
+    # Older versions of torch have no uint16: values are cast through int32 to int16 (keeping the low 16 bits) and reinterpreted as uint16
+    pixel_data = (pixel_data * scale_factor).round_().clamp_(0, 2**16 - 1)
+    pixel_data = pixel_data.to(torch.int32).to(torch.int16).contiguous().cpu().numpy().view(np.uint16)
     # Affine
     Sx, Sy, Sz = ds_NM.DetectorInformationSequence[0].ImagePositionPatient
     dx = dy = ds_NM.PixelSpacing[0]
@@ -727,8 +880,8 @@ def save_dcm(
     if not single_dicom_file:
         dss = []
         for i in range(pixel_data.shape[0]):
-            # Load existing DICOM file
-            ds_i = copy.deepcopy(ds)
+            # Copy header of the series
+            ds_i = _copy_slice_dataset(ds)
             ds_i.InstanceNumber = i + 1
             ds_i.ImagePositionPatient = [Sx, Sy, Sz + i * dz]
             # Create SOP Instance UID unique to slice
@@ -747,6 +900,12 @@ def save_dcm(
             # If single dicom file, will overwrite any file that is there
             ds.save_as(os.path.join(save_path, f'{ds.SOPInstanceUID}.dcm'))
         else:
-            for ds_i in dss:
-                ds_i.save_as(os.path.join(save_path, f'{ds_i.SOPInstanceUID}.dcm'))
+            # Slices are written concurrently so that file I/O overlaps; this requires every slice to have its own file
+            filenames = [os.path.join(save_path, f'{ds_i.SOPInstanceUID}.dcm') for ds_i in dss]
+            if len(set(filenames)) != len(filenames):
+                raise Exception("Slices of the DICOM series do not have unique SOPInstanceUIDs; cannot write them to separate files")
+            _map_parallel(
+                lambda args: args[0].save_as(args[1]),
+                list(zip(dss, filenames))
+            )
         
\ No newline at end of file
@@ -3,4 +3,4 @@
 
 from .dicom_creation import create_ds
 from .interfile import get_header_value, get_attenuation_map_interfile
-from .dicom import open_multifile, align_images_affine, _get_affine_multifile
\ No newline at end of file
+from .dicom import open_multifile, align_images_affine, _get_affine_multifile, _map_parallel
\ No newline at end of file
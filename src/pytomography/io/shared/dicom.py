@@ -3,6 +3,7 @@ import warnings
 import os
 import collections.abc
 from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Sequence
 import numpy as np
@@ -20,6 +21,27 @@ from pytomography.utils import (
     get_mu_from_spectrum_interp,
 )
 
+def _map_parallel(function, items: Sequence, max_workers: int = 8) -> list:
+    """Applies ``function`` to each of ``items`` using a pool of threads, returning the results in order. Used for reading many DICOM files, where time is dominated by file I/O.
+
+    Args:
+        function (Callable): Function to apply.
+        items (Sequence): Items to apply the function to.
+        max_workers (int, optional): Maximum number of threads. Defaults to 8.
+
+    Returns:
+        list: Results of the function for each item.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(function, items))
+
+def _read_slice_location(file: str) -> float:
+    return float(pydicom.read_file(file, stop_before_pixels=True).ImagePositionPatient[2])
+
+def _read_slice(file: str) -> Sequence[np.array, float]:
+    ds = pydicom.read_file(file)
+    return ds.RescaleSlope*ds.pixel_array+ ds.RescaleIntercept, float(ds.ImagePositionPatient[2])
+
 def _get_affine_multifile(files: Sequence[str]):
     """Computes an affine matrix corresponding the coordinate system of a CT DICOM file. Note that since CT scans consist of many independent DICOM files, ds corresponds to an individual one of these files. This is why the maximum z value is also required (across all seperate independent DICOM files).
 
@@ -54,12 +76,7 @@ def open_multifile(
     Returns:
         np.array: CT scan in units of Hounsfield Units at the effective CT energy.
     """
-    array = []
-    slice_locs = []
-    for file in files:
-        ds = pydicom.read_file(file)
-        array.append(ds.RescaleSlope*ds.pixel_array+ ds.RescaleIntercept)
-        slice_locs.append(float(ds.ImagePositionPatient[2]))
+    array, slice_locs = zip(*_map_parallel(_read_slice, files))
     array = np.transpose(np.array(array)[np.argsort(slice_locs)[::-1]], (2,1,0)).astype(np.float32)
     return array[:,:,::-1].copy()
 
@@ -72,10 +89,7 @@ def compute_max_slice_loc_multifile(files: Sequence[str]) -> float:
     Returns:
         float: Maximum z location
     """
-    slice_locs = []
-    for file in files:
-        ds = pydicom.read_file(file)
-        slice_locs.append(float(ds.ImagePositionPatient[2]))
+    slice_locs = _map_parallel(_read_slice_location, files)
     return np.max(slice_locs)
 
 def compute_slice_thickness_multifile(files: Sequence[str]) -> float:
@@ -87,10 +101,7 @@ def compute_slice_thickness_multifile(files: Sequence[str]) -> float:
     Returns:
         float: Slice thickness of the scan
     """
-    slice_locs = []
-    for file in files:
-        ds = pydicom.read_file(file)
-        slice_locs.append(float(ds.ImagePositionPatient[2]))
+    slice_locs = _map_parallel(_read_slice_location, files)
     slice_locs = np.array(slice_locs)[np.argsort(slice_locs)]
     return slice_locs[1] - slice_locs[0]
 
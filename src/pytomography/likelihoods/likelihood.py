@@ -41,7 +41,9 @@ class Likelihood:
         """
         self.n_subsets = n_subsets
         if n_subsets < 2:
-            self.norm_BP = self.system_matrix.compute_normalization_factor()
+            # Reused when called repeatedly with one subset (e.g. a single EM step per call in DIPRecon)
+            if self.n_subsets_previous!=self.n_subsets:
+                self.norm_BP = self.system_matrix.compute_normalization_factor()
         else:
             self.system_matrix.set_n_subsets(n_subsets)
             if self.n_subsets_previous!=self.n_subsets:
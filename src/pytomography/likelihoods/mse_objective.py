@@ -31,9 +31,11 @@ class NegativeMSELikelihood(Likelihood):
             torch.Tensor: The gradient of the Poisson likelihood.
         """
         proj_subset = self._get_projection_subset(self.projections, subset_idx)
-        additive_term_subset = self._get_projection_subset(self.additive_term, subset_idx)
-        self.projections_predicted = self.system_matrix.forward(object, subset_idx) + additive_term_subset
-        return self.system_matrix.backward(proj_subset - self.projections_predicted , subset_idx) * self.scaling_constant
+        self.projections_predicted = self.system_matrix.forward(object, subset_idx)
+        if self.exists_additive_term:
+            self.projections_predicted.add_(self._get_projection_subset(self.additive_term, subset_idx))
+        residual = torch.sub(proj_subset, self.projections_predicted)
+        return self.system_matrix.backward(residual, subset_idx).mul_(self.scaling_constant)
     
 class SARTWeightedNegativeMSELikelihood(Likelihood):
     def __init__(
@@ -43,6 +45,21 @@ class SARTWeightedNegativeMSELikelihood(Likelihood):
         additive_term: torch.Tensor = None,
         ) -> None:
         super().__init__(system_matrix, projections, additive_term)
+        # H_m 1 + delta for each subset index; independent of the object, so only computed once
+        self._norm_FP_cache = {}
+        
+    def _set_n_subsets(
+        self,
+        n_subsets: int
+        )-> None:
+        """Sets the number of subsets to be used when computing the likelihood. Cached forward projections of ones are discarded if the subsets change.
+
+        Args:
+            n_subsets (int): Number of subsets
+        """
+        if n_subsets != self.n_subsets_previous:
+            self._norm_FP_cache = {}
+        super()._set_n_subsets(n_subsets)
         
     def compute_gradient(
         self,
@@ -61,7 +78,11 @@ class SARTWeightedNegativeMSELikelihood(Likelihood):
             torch.Tensor: The gradient of the Poisson likelihood.
         """
         proj_subset = self._get_projection_subset(self.projections, subset_idx)
-        additive_term_subset = self._get_projection_subset(self.additive_term, subset_idx)
-        self.projections_predicted = self.system_matrix.forward(object, subset_idx) + additive_term_subset
-        norm_FP = self.system_matrix.forward(object*0+1, subset_idx) # TODO: Slow implementation
-        return self.system_matrix.backward((proj_subset - self.projections_predicted)/(norm_FP+pytomography.delta) , subset_idx)
\ No newline at end of file
+        self.projections_predicted = self.system_matrix.forward(object, subset_idx)
+        if self.exists_additive_term:
+            self.projections_predicted.add_(self._get_projection_subset(self.additive_term, subset_idx))
+        if subset_idx not in self._norm_FP_cache:
+            self._norm_FP_cache[subset_idx] = self.system_matrix.forward(torch.ones_like(object), subset_idx).add_(pytomography.delta)
+        residual = torch.sub(proj_subset, self.projections_predicted)
+        residual.div_(self._norm_FP_cache[subset_idx])
+        return self.system_matrix.backward(residual, subset_idx)
\ No newline at end of file
@@ -1,4 +1,6 @@
 from __future__ import annotations
+from typing import Sequence
+import math
 import torch
 import pytomography
 from pytomography.transforms import Transform
@@ -14,6 +16,56 @@ except:
     pass
     #Warning('parallelproj not installed. The SPECTCompleteSystemMatrix class requires parallelproj to be installed.')
 
+def _forward_project_group(
+    object_i: torch.Tensor,
+    beta_i: torch.Tensor,
+    angle_indices_i: torch.Tensor,
+    rotation_transform: RotationTransform,
+    obj2obj_transforms: list[Transform],
+) -> torch.Tensor:
+    """Forward projects a group of objects (one for each angle in the group): rotates each object, applies the object mappings, and sums along the projection direction.
+
+    Args:
+        object_i (torch.Tensor[N, Lx, Ly, Lz]): Padded objects.
+        beta_i (torch.Tensor[N]): Rotation angles :math:`\beta` of each object.
+        angle_indices_i (torch.Tensor[N]): Projection indices of each object.
+        rotation_transform (RotationTransform): Rotation used for each object.
+        obj2obj_transforms (list[Transform]): Object mappings applied before summing.
+
+    Returns:
+        torch.Tensor[N, Ly, Lz]: Projections.
+    """
+    # beta = 270 - phi, and backward transform called because projection should be at +beta (requires inverse rotation of object)
+    object_i = rotation_transform.backward(object_i, beta_i)
+    # Apply object 2 object transforms
+    for transform in obj2obj_transforms:
+        object_i = transform.forward(object_i, angle_indices_i)
+    return object_i.sum(axis=1)
+
+def _back_project_group(
+    object_i: torch.Tensor,
+    beta_i: torch.Tensor,
+    angle_indices_i: torch.Tensor,
+    rotation_transform: RotationTransform,
+    obj2obj_transforms_reversed: list[Transform],
+) -> torch.Tensor:
+    """Back projects a group of projections that have already been smeared along the projection direction: applies the adjoint object mappings and rotates each object back.
+
+    Args:
+        object_i (torch.Tensor[N, Lx, Ly, Lz]): Smeared projections.
+        beta_i (torch.Tensor[N]): Rotation angles :math:`\beta` of each projection.
+        angle_indices_i (torch.Tensor[N]): Projection indices.
+        rotation_transform (RotationTransform): Rotation used for each object.
+        obj2obj_transforms_reversed (list[Transform]): Object mappings, in reverse order.
+
+    Returns:
+        torch.Tensor[N, Lx, Ly, Lz]: Back projected objects for each angle.
+    """
+    for transform in obj2obj_transforms_reversed:
+        object_i = transform.backward(object_i, angle_indices_i)
+    # Rotate all objects by by their respective angle
+    return rotation_transform.forward(object_i, beta_i)
+
 class SPECTSystemMatrix(SystemMatrix):
     r"""System matrix for SPECT imaging implemented using the rotate+sum technique.
     
@@ -22,8 +74,9 @@ class SPECTSystemMatrix(SystemMatrix):
             proj2proj_transforms (Sequence[Transform]): Sequence of proj mappings that occur after forward projection.
             object_meta (SPECTObjectMeta): SPECT Object metadata.
             proj_meta (SPECTProjMeta): SPECT projection metadata.
-            n_parallel (int): Number of projections to use in parallel when applying transforms. More parallel events may speed up reconstruction time, but also increases GPU usage. Defaults to 1.
+            n_parallel (int | None): Number of projections to use in parallel when applying transforms. More parallel events may speed up reconstruction time, but also increases GPU usage. If None, all projections are rotated and transformed in a single batch. Defaults to 1.
             object_initial_based_on_camera_path (bool): Whether or not to initialize the object estimate based on the camera path; this sets voxels to zero that are outside the SPECT camera path. Defaults to False.
+            compile_projections (bool): Whether to compile the rotate/transform/sum work done for each group of angles with ``torch.compile`` (requires PyTorch 2.0 or later), using CUDA graphs to remove per-group launch overhead. Forward projection, and back projection without the normalization constant, are compiled; back projection with the normalization constant runs eagerly. Defaults to False.
     """
     def __init__(
         self,
@@ -32,12 +85,30 @@ class SPECTSystemMatrix(SystemMatrix):
         object_meta: SPECTObjectMeta,
         proj_meta: SPECTProjMeta,
         n_parallel = 1,
-        object_initial_based_on_camera_path: bool = False
+        object_initial_based_on_camera_path: bool = False,
+        compile_projections: bool = False,
     ) -> None:
         super(SPECTSystemMatrix, self).__init__(object_meta, proj_meta, obj2obj_transforms, proj2proj_transforms)
         self.n_parallel = n_parallel
         self.object_initial_based_on_camera_path = object_initial_based_on_camera_path
         self.rotation_transform = RotationTransform()
+        # Back projection applies the transforms in reverse order: build these lists once rather than in every call
+        self._obj2obj_transforms_reversed = self.obj2obj_transforms[::-1]
+        self._proj2proj_transforms_reversed = self.proj2proj_transforms[::-1]
+        if compile_projections:
+            if not hasattr(torch, 'compile'):
+                raise Exception("`compile_projections=True` requires torch.compile (PyTorch 2.0 or later)")
+            # Outputs are consumed before the next call, as required when CUDA graphs reuse their output buffers
+            self._forward_project_group = torch.compile(_forward_project_group, mode='reduce-overhead')
+            self._back_project_group = torch.compile(_back_project_group, mode='reduce-overhead')
+        else:
+            self._forward_project_group = _forward_project_group
+            self._back_project_group = _back_project_group
+        # Rotation angles beta = 270 - phi of all projections, computed once rather than in every projection
+        self._beta = (270 - torch.as_tensor(self.proj_meta.angles)).to(pytomography.device).to(pytomography.dtype)
+        self._all_angle_indices = torch.arange(self.proj_meta.num_projections).to(pytomography.device)
+        self._boundary_box_bp = None
+        self._padded_norm_proj_cache = None
         
     def _get_object_initial(self, device=None):
         """Returns an initial object estimate used in reconstruction algorithms. By default, this is a tensor of ones with the same shape as the object metadata.
@@ -47,18 +118,49 @@ class SPECTSystemMatrix(SystemMatrix):
         """
         object_initial = torch.ones((1,*self.object_meta.shape)).to(device)
         if self.object_initial_based_on_camera_path:
-            for i in range(len(self.proj_meta.angles)):
-                cutoff_idx = int(np.ceil(self.object_meta.shape[0]/ 2 - self.proj_meta.radii[i]/self.object_meta.dr[0]))
-                if cutoff_idx<0:
-                    continue
-                img_cutoff = torch.ones((1,*self.object_meta.shape)).to(device)
-                img_cutoff[:, :cutoff_idx, :, :] = 0
+            cutoff_idx = np.ceil(self.object_meta.shape[0]/ 2 - np.asarray(self.proj_meta.radii)/self.object_meta.dr[0]).astype(int)
+            valid = np.flatnonzero(cutoff_idx>=0)
+            n_parallel = max(len(valid), 1) if self.n_parallel is None else self.n_parallel
+            x_indices = torch.arange(self.object_meta.shape[0]).to(device)
+            # One cutoff mask per angle, rotated in batches of n_parallel angles
+            for i in range(0, len(valid), n_parallel):
+                valid_i = valid[i:i+n_parallel]
+                cutoff_idx_i = torch.as_tensor(cutoff_idx[valid_i]).to(device)
+                img_cutoff = (x_indices[None] >= cutoff_idx_i[:,None]).to(object_initial.dtype)
+                img_cutoff = img_cutoff[:,:,None,None].expand(-1, *self.object_meta.shape)
                 img_cutoff = pad_object(img_cutoff, mode='replicate')
-                img_cutoff = rotate_detector_z(img_cutoff, -self.proj_meta.angles[i])
+                img_cutoff = rotate_detector_z(img_cutoff, -self.proj_meta.angles[torch.as_tensor(valid_i).to(self.proj_meta.angles.device)])
                 img_cutoff = unpad_object(img_cutoff)
-                object_initial *= img_cutoff
+                object_initial *= img_cutoff.prod(dim=0, keepdim=True)
         return object_initial
     
+    def _get_boundary_box_bp(self) -> torch.Tensor:
+        """Returns the box used to perform back projection. This is computed once and only recomputed if the object shape changes.
+
+        Returns:
+            torch.Tensor: Padded box of ones with the shape of the object.
+        """
+        shape = (1, *self.object_meta.shape)
+        if self._boundary_box_bp is None or self._boundary_box_bp[0] != shape:
+            boundary_box_bp = pad_object(torch.ones(shape).to(pytomography.device), mode='back_project')
+            self._boundary_box_bp = (shape, boundary_box_bp)
+        return self._boundary_box_bp[1]
+
+    def _get_padded_norm_proj(self, shape: Sequence[int]) -> torch.Tensor:
+        """Returns padded projections of ones used to compute :math:`H^T 1` during back projection. This is computed once and only recomputed if the projection shape changes.
+
+        Args:
+            shape (Sequence[int]): Shape of the (unpadded) projections.
+
+        Returns:
+            torch.Tensor: Padded projections of ones.
+        """
+        shape = tuple(shape)
+        if self._padded_norm_proj_cache is None or self._padded_norm_proj_cache[0] != shape:
+            norm_proj = pad_proj(torch.ones(shape).to(pytomography.device))
+            self._padded_norm_proj_cache = (shape, norm_proj)
+        return self._padded_norm_proj_cache[1]
+        
     def compute_normalization_factor(self, subset_idx : int | None = None) -> torch.tensor:
         """Function used to get normalization factor :math:`H^T_m 1` corresponding to projection subset :math:`m`.
 
@@ -71,7 +173,7 @@ class SPECTSystemMatrix(SystemMatrix):
         
         norm_proj = torch.ones((1, *self.proj_meta.shape)).to(pytomography.device)
         if subset_idx is not None:
-            norm_proj = norm_proj[:,self.subset_indices_array[subset_idx]]
+            norm_proj = norm_proj[:,self.subset_slices[subset_idx]]
         return self.backward(norm_proj, subset_idx)
         
     def set_n_subsets(
@@ -88,6 +190,8 @@ class SPECTSystemMatrix(SystemMatrix):
         for i in range(n_subsets):
             subset_indices_array.append(indices[i::n_subsets])
         self.subset_indices_array = subset_indices_array
+        # Equivalent strided slices: indexing projections with these returns views rather than copies
+        self.subset_slices = [slice(i, None, n_subsets) for i in range(n_subsets)]
         
     def get_projection_subset(
         self,
@@ -103,7 +207,7 @@ class SPECTSystemMatrix(SystemMatrix):
         Returns:
             torch.tensor: subsampled projections :math:`g_m`
         """
-        return projections[:,self.subset_indices_array[subset_idx]]
+        return projections[:,self.subset_slices[subset_idx]]
     
     def get_weighting_subset(
         self,
@@ -140,28 +244,31 @@ class SPECTSystemMatrix(SystemMatrix):
         if subset_idx is not None:
             angle_subset = self.subset_indices_array[subset_idx]
         N_angles = self.proj_meta.num_projections if subset_idx is None else len(angle_subset)
-        angle_indices = torch.arange(N_angles).to(pytomography.device) if subset_idx is None else angle_subset
-        # Start projection
-        object = object.to(pytomography.device)
+        angle_indices = self._all_angle_indices if subset_idx is None else angle_subset
+        n_parallel = N_angles if self.n_parallel is None else self.n_parallel
+        # Start projection: the object is padded once (rather than each of its copies in every group of angles)
+        batch_size = object.shape[0]
+        object = pad_object(object.to(pytomography.device))
+        beta = self._beta.index_select(0, angle_indices)
         proj = torch.zeros(
-            (object.shape[0],N_angles,*self.proj_meta.padded_shape[1:])
+            (batch_size,N_angles,*self.proj_meta.padded_shape[1:])
             ).to(pytomography.device)
         # Loop through all angles (or groups of angles in parallel)
-        for i in range(0, len(angle_indices), self.n_parallel):
+        for i in range(0, len(angle_indices), n_parallel):
             # Get angle indices
-            angle_indices_single_batch_i = angle_indices[i:i+self.n_parallel]
-            angle_indices_i = angle_indices_single_batch_i.repeat(object.shape[0])
+            angle_indices_single_batch_i = angle_indices[i:i+n_parallel]
+            angle_indices_i = angle_indices_single_batch_i.repeat(batch_size)
             # Format Object
             object_i = torch.repeat_interleave(object, len(angle_indices_single_batch_i), 0)
-            object_i = pad_object(object_i)
-            # beta = 270 - phi, and backward transform called because projection should be at +beta (requires inverse rotation of object)
-            object_i = self.rotation_transform.backward(object_i, 270-self.proj_meta.angles[angle_indices_i])
-            # Apply object 2 object transforms
-            for transform in self.obj2obj_transforms:
-                object_i = transform.forward(object_i, angle_indices_i)
-            # Reshape to 5D tensor of shape [batch_size, N_parallel, Lx, Ly, Lz]
-            object_i = object_i.reshape((object.shape[0], -1, *self.object_meta.padded_shape))
-            proj[:,i:i+self.n_parallel] = object_i.sum(axis=2)
+            proj_i = self._forward_project_group(
+                object_i,
+                beta[i:i+n_parallel].repeat(batch_size),
+                angle_indices_i,
+                self.rotation_transform,
+                self.obj2obj_transforms
+            )
+            # Reshape to 4D tensor of shape [batch_size, N_parallel, Ly, Lz]
+            proj[:,i:i+n_parallel] = proj_i.reshape((batch_size, -1, *self.object_meta.padded_shape[1:]))
         for transform in self.proj2proj_transforms:
             proj = transform.forward(proj)
         return unpad_proj(proj)
@@ -186,48 +293,59 @@ class SPECTSystemMatrix(SystemMatrix):
         if subset_idx is not None:
             angle_subset = self.subset_indices_array[subset_idx]
         N_angles = self.proj_meta.num_projections if subset_idx is None else len(angle_subset)
-        angle_indices = torch.arange(N_angles).to(pytomography.device) if subset_idx is None else angle_subset
+        angle_indices = self._all_angle_indices if subset_idx is None else angle_subset
         # Box used to perform back projection
-        boundary_box_bp = pad_object(torch.ones((1, *self.object_meta.shape)).to(pytomography.device), mode='back_project')
-        # Pad proj and norm_proj (norm_proj used to compute sum_j H_ij)
-        norm_proj = torch.ones(proj.shape).to(pytomography.device)
+        boundary_box_bp = self._get_boundary_box_bp()
+        # Pad proj and norm_proj (norm_proj used to compute sum_j H_ij, only needed if it is returned)
+        if return_norm_constant:
+            norm_proj = self._get_padded_norm_proj(proj.shape)
+            if self.proj2proj_transforms:
+                # Transforms receive a copy so the cached tensor is never modified
+                norm_proj = norm_proj.clone()
         proj = pad_proj(proj)
-        norm_proj = pad_proj(norm_proj)
         # First apply proj transforms before back projecting
-        for transform in self.proj2proj_transforms[::-1]:
+        for transform in self._proj2proj_transforms_reversed:
             if return_norm_constant:
                 proj, norm_proj = transform.backward(proj, norm_proj)
             else:
                 proj = transform.backward(proj)
         # Setup for back projection
+        n_parallel = N_angles if self.n_parallel is None else self.n_parallel
+        beta = self._beta.index_select(0, angle_indices)
         object = torch.zeros([proj.shape[0], *self.object_meta.padded_shape]).to(pytomography.device)
-        norm_constant = torch.zeros([proj.shape[0], *self.object_meta.padded_shape]).to(pytomography.device)
-        for i in range(0, len(angle_indices), self.n_parallel):
-            angle_indices_i = angle_indices[i:i+self.n_parallel]
+        if return_norm_constant:
+            norm_constant = torch.zeros([proj.shape[0], *self.object_meta.padded_shape]).to(pytomography.device)
+        for i in range(0, len(angle_indices), n_parallel):
+            angle_indices_i = angle_indices[i:i+n_parallel]
+            beta_i = beta[i:i+n_parallel]
             # Perform back projection
-            object_i = proj[:,i:i+self.n_parallel].flatten(0,1).unsqueeze(1) * boundary_box_bp
-            norm_constant_i = norm_proj[:,i:i+self.n_parallel].flatten(0,1).unsqueeze(1) * boundary_box_bp
-            # Apply object mappings
-            for transform in self.obj2obj_transforms[::-1]:
-                if return_norm_constant:
+            object_i = proj[:,i:i+n_parallel].flatten(0,1).unsqueeze(1) * boundary_box_bp
+            if return_norm_constant:
+                norm_constant_i = norm_proj[:,i:i+n_parallel].flatten(0,1).unsqueeze(1) * boundary_box_bp
+                # Apply object mappings
+                for transform in self._obj2obj_transforms_reversed:
                     object_i, norm_constant_i = transform.backward(object_i, angle_indices_i, norm_constant=norm_constant_i)
-                else:
-                    object_i  = transform.backward(object_i, angle_indices_i)
-            # Rotate all objects by by their respective angle
-            object_i = self.rotation_transform.forward(object_i, 270-self.proj_meta.angles[angle_indices_i])
-            norm_constant_i = self.rotation_transform.forward(norm_constant_i, 270-self.proj_meta.angles[angle_indices_i])
+                # Rotate all objects by by their respective angle
+                object_i = self.rotation_transform.forward(object_i, beta_i)
+                norm_constant_i = self.rotation_transform.forward(norm_constant_i, beta_i)
+                norm_constant_i = norm_constant_i.reshape((object.shape[0], -1, *self.object_meta.padded_shape))
+                norm_constant += norm_constant_i.sum(axis=1)
+            else:
+                object_i = self._back_project_group(
+                    object_i,
+                    beta_i,
+                    angle_indices_i,
+                    self.rotation_transform,
+                    self._obj2obj_transforms_reversed
+                )
             # Reshape to 5D tensor of shape [batch_size, N_parallel, Lx, Ly, Lz]
             object_i = object_i.reshape((object.shape[0], -1, *self.object_meta.padded_shape))
-            norm_constant_i = norm_constant_i.reshape((object.shape[0], -1, *self.object_meta.padded_shape))
             # Add to total by summing over the N_parallel dimension (sum over all angles)
             object += object_i.sum(axis=1)
-            norm_constant += norm_constant_i.sum(axis=1)
-        # Unpad
-        norm_constant = unpad_object(norm_constant)
+        # Unpad and return
         object = unpad_object(object)
-        # Return
         if return_norm_constant:
-            return object, norm_constant
+            return object, unpad_object(norm_constant)
         else:
             return object
         
@@ -253,6 +371,7 @@ class SPECTCompleteSystemMatrix(SPECTSystemMatrix):
         self.psf_kernel = psf_kernel
         self.psf_kernel._configure(object_meta)
         self.X_obj = self._get_object_positions()
+        self.X_proj = self._get_all_proj_positions()
         self.system_matrices = None
         if store_system_matrix is not None:
             self.system_matrix_device = store_system_matrix
@@ -272,64 +391,76 @@ class SPECTCompleteSystemMatrix(SPECTSystemMatrix):
         if store_system_matrix is not None:
             self.system_matrices = [self._compute_system_matrix_components(i).to(torch.float16).to(self.system_matrix_device) for i in range(self.proj_meta.num_projections)]
         
-    def _get_proj_positions(self, idx):
+    def _get_all_proj_positions(self):
+        # Detector pixel grid is the same for all angles: build it once and rotate to each angle
         Ny = self.proj_meta.shape[1]
         Nz = self.proj_meta.shape[2]
         dy = self.proj_meta.dr[0]
         dz = self.proj_meta.dr[1]
-        angle = (270-self.proj_meta.angles[idx]) * torch.pi / 180
-        radius = self.proj_meta.radii[idx]
-        yv, zv = torch.meshgrid(torch.arange(-Ny/2+0.5, Ny/2+0.5, 1)*dy, torch.arange(-Nz/2+0.5, Nz/2+0.5, 1)*dz, indexing='ij')
-        xv = torch.ones(yv.shape) * radius
-        X = torch.stack([xv,yv,zv], dim=-1).to(pytomography.device)
-        rotation_matrix = torch.tensor([
-                [torch.cos(angle), -torch.sin(angle), 0],
-                [torch.sin(angle), torch.cos(angle), 0],
-                [0, 0, 1]
-            ]).to(pytomography.device)
-        return torch.flatten(torch.matmul(rotation_matrix.unsqueeze(0).unsqueeze(0), X.unsqueeze(-1)).squeeze(), end_dim=-2)
+        kwargs = {'dtype': pytomography.dtype, 'device': pytomography.device}
+        yv, zv = torch.meshgrid(torch.arange(-Ny/2+0.5, Ny/2+0.5, 1, **kwargs)*dy, torch.arange(-Nz/2+0.5, Nz/2+0.5, 1, **kwargs)*dz, indexing='ij')
+        yv = yv.ravel()
+        zv = zv.ravel()
+        angles = (270-self.proj_meta.angles) * torch.pi / 180
+        cos_angles = torch.cos(angles)[:,None]
+        sin_angles = torch.sin(angles)[:,None]
+        radii = torch.as_tensor(self.proj_meta.radii).to(pytomography.device).to(angles.dtype)[:,None]
+        # Rotation of (radius, y, z) about the z axis
+        return torch.stack([
+            cos_angles*radii - sin_angles*yv,
+            sin_angles*radii + cos_angles*yv,
+            zv.expand(len(angles), -1)
+        ], dim=-1)
+    
+    def _get_proj_positions(self, idx):
+        return self.X_proj[idx]
 
     def _get_object_positions(self):
         Nx, Ny, Nz = self.object_meta.shape
         dx, dy, dz = self.object_meta.dr
+        kwargs = {'dtype': pytomography.dtype, 'device': pytomography.device}
         xv, yv, zv = torch.meshgrid(
-            [torch.arange(-Nx/2+0.5, Nx/2+0.5, 1)*dx, torch.arange(-Ny/2+0.5, Ny/2+0.5, 1)*dy, torch.arange(-Nz/2+0.5, Nz/2+0.5, 1)*dz], indexing='ij')
-        X = torch.stack([xv,yv,zv], dim=-1).to(pytomography.device)
+            [torch.arange(-Nx/2+0.5, Nx/2+0.5, 1, **kwargs)*dx, torch.arange(-Ny/2+0.5, Ny/2+0.5, 1, **kwargs)*dy, torch.arange(-Nz/2+0.5, Nz/2+0.5, 1, **kwargs)*dz], indexing='ij')
+        X = torch.stack([xv,yv,zv], dim=-1)
         return torch.flatten(X, end_dim=-2)
         
     def _compute_system_matrix_components(self, idx):
         if self.system_matrices is not None:
-            return self.system_matrices[idx].to(torch.float32)
+            # Stored in FP16; upcast a block of rows at a time in _system_matrix_mv
+            return self.system_matrices[idx]
         valid_proj_idx = self.valid_proj_pixel_mask[idx]
         valid_obj_idx = self.valid_obj_voxel_mask
         X_proj = self._get_proj_positions(idx)[valid_proj_idx]
         X_obj = self.X_obj[valid_obj_idx]
         # Assume 0 contribution outside of valid regions (requires cropping object initial and projection data)
-        system_matrix_proj_i = torch.einsum(
-            'i,j->ij',
-            torch.ones(valid_proj_idx.sum()).to(pytomography.device),
-            torch.ones(valid_obj_idx.sum()).to(pytomography.device)
-        )
-        angle = (270-self.proj_meta.angles[idx]) * torch.pi / 180
+        system_matrix_proj_i = torch.empty((X_proj.shape[0], X_obj.shape[0]), device=pytomography.device, dtype=pytomography.dtype)
+        # Python floats: multiplications below use them as scalars, with no device tensors for the trig values
+        angle = math.radians(270-float(self.proj_meta.angles[idx]))
+        cos_angle = math.cos(angle)
+        sin_angle = math.sin(angle)
         N_splits = 64
-        # PSF
+        # PSF and attenuation are computed in a single pass over each group of projection pixels, and each row is written once
         for X_proj_sub, indices in zip(torch.tensor_split(X_proj, N_splits), torch.tensor_split(torch.arange(X_proj.shape[0]).to(pytomography.device), N_splits)):
+            # PSF
             delta_r = (X_proj_sub[:,None] - X_obj)
-            d = torch.abs(delta_r[:,:,0]*torch.cos(angle) + delta_r[:,:,1]*torch.sin(angle))
-            x = delta_r[:,:,1]*torch.cos(angle) - delta_r[:,:,0]*torch.sin(angle)
+            d = torch.abs(delta_r[:,:,0]*cos_angle + delta_r[:,:,1]*sin_angle)
+            x = delta_r[:,:,1]*cos_angle - delta_r[:,:,0]*sin_angle
             y = delta_r[:,:,2]
-            system_matrix_proj_i[indices] *= self.psf_kernel(x.ravel(),y.ravel(),d.ravel()).reshape(x.shape)
-        # Attenuation
-        for X_proj_sub, indices in zip(torch.tensor_split(X_proj, N_splits), torch.tensor_split(torch.arange(X_proj.shape[0]).to(pytomography.device), N_splits)):
-            X_start = X_obj[None].repeat((X_proj_sub.shape[0],1,1))
-            X_end = X_proj_sub[:,None].repeat((1,X_obj.shape[0],1))
-            system_matrix_proj_i[indices] *= torch.exp(-parallelproj.joseph3d_fwd(
-                torch.flatten(X_start, end_dim=-2),
-                torch.flatten(X_end, end_dim=-2),
+            system_matrix_sub = self.psf_kernel(x.ravel(),y.ravel(),d.ravel()).reshape(x.shape)
+            # Free the PSF working set before the attenuation one is built
+            del delta_r, d, x, y
+            # Attenuation
+            # Broadcast views (no copy); parallelproj needs flat line endpoints, so each is materialized once by reshape
+            X_start = X_obj.unsqueeze(0).expand(X_proj_sub.shape[0], -1, -1)
+            X_end = X_proj_sub.unsqueeze(1).expand(-1, X_obj.shape[0], -1)
+            system_matrix_sub.mul_(torch.exp(-parallelproj.joseph3d_fwd(
+                X_start.reshape(-1, 3),
+                X_end.reshape(-1, 3),
                 self.attenuation_map[0],
                 self.origin_amap,
                 self.voxel_size_amap # TODO: adjust for CT,
-            )).reshape(X_proj_sub.shape[0], X_obj.shape[0])
+            )).reshape(X_proj_sub.shape[0], X_obj.shape[0]))
+            system_matrix_proj_i[indices] = system_matrix_sub
         return system_matrix_proj_i
     
     def _compute_projections_mask(self, photopeak):
@@ -338,6 +469,32 @@ class SPECTCompleteSystemMatrix(SPECTSystemMatrix):
         )>0
         #self.projections_mask = photopeak > 0
     
+    def _system_matrix_mv(self, system_matrix_proj_i, vector, transpose=False):
+        """Computes :math:`Av` (or :math:`A^Tv` if ``transpose``) for the system matrix of a single angle. Stored FP16 matrices are upcast to ``pytomography.dtype`` a block of rows at a time, so the vector, accumulation and output stay in full precision without a full precision copy of the matrix.
+
+        Args:
+            system_matrix_proj_i (torch.Tensor): System matrix of a single angle, of shape [N_proj_pixels, N_obj_voxels].
+            vector (torch.Tensor): Vector on the same device as the matrix.
+            transpose (bool): Whether to multiply by the transpose of the matrix. Defaults to False.
+
+        Returns:
+            torch.Tensor: Product in ``pytomography.dtype``.
+        """
+        if system_matrix_proj_i.dtype == pytomography.dtype:
+            return torch.mv(system_matrix_proj_i.t(), vector) if transpose else torch.mv(system_matrix_proj_i, vector)
+        N_splits = 64
+        if transpose:
+            output = torch.zeros(system_matrix_proj_i.shape[1], device=vector.device, dtype=pytomography.dtype)
+        else:
+            output = torch.empty(system_matrix_proj_i.shape[0], device=vector.device, dtype=pytomography.dtype)
+        for indices in torch.tensor_split(torch.arange(system_matrix_proj_i.shape[0], device=vector.device), N_splits):
+            system_matrix_sub = system_matrix_proj_i[indices].to(pytomography.dtype)
+            if transpose:
+                output += torch.mv(system_matrix_sub.t(), vector[indices])
+            else:
+                output[indices] = torch.mv(system_matrix_sub, vector)
+        return output
+
     def forward(
         self,
         object,
@@ -352,8 +509,7 @@ class SPECTCompleteSystemMatrix(SPECTSystemMatrix):
             ).to(pytomography.device)
         for idx in angle_indices:
             system_matrix_proj_i = self._compute_system_matrix_components(idx)
-            proj[:,idx,self.valid_proj_pixel_mask[idx]] = torch.einsum(
-                'ij,j->i',
+            proj[:,idx,self.valid_proj_pixel_mask[idx]] = self._system_matrix_mv(
                 system_matrix_proj_i,
                 object.ravel()[self.valid_obj_voxel_mask].to(self.system_matrix_device)
             ).to(pytomography.device)
@@ -372,9 +528,9 @@ class SPECTCompleteSystemMatrix(SPECTSystemMatrix):
         proj = proj.flatten(start_dim=2)
         for i, idx in enumerate(angle_indices):
             system_matrix_proj_i = self._compute_system_matrix_components(idx)
-            object[self.valid_obj_voxel_mask] += torch.einsum(
-                'ij,i->j',
+            object[self.valid_obj_voxel_mask] += self._system_matrix_mv(
                 system_matrix_proj_i,
-                proj[0,i][self.valid_proj_pixel_mask[idx]].to(self.system_matrix_device)
+                proj[0,i][self.valid_proj_pixel_mask[idx]].to(self.system_matrix_device),
+                transpose=True
             ).to(pytomography.device)
         return object.reshape(1,*self.object_meta.shape)
\ No newline at end of file
@@ -119,11 +119,22 @@ class SPECTAttenuationTransform(Transform):
 			return object_i
 
 	@torch.no_grad()
-	def compute_average_prob_matrix(self):
+	def compute_average_prob_matrix(self, n_parallel: int = 1):
+		"""Computes the probability of detection matrix averaged over all projection angles.
+
+		Args:
+			n_parallel (int): Number of angles rotated together in a single batch. Larger values reduce the number of rotation calls, but increase GPU usage. Defaults to 1.
+
+		Returns:
+			torch.tensor: Tensor of size [1, Lx, Ly, Lz] corresponding to the average probability of detection.
+		"""
 		attenuation_map = pad_object(self.attenuation_map)
 		average_norm_factor = torch.zeros(attenuation_map.shape).to(pytomography.device)
-		for angle in self.proj_meta.angles:
-			average_norm_factor += rotate_detector_z(get_prob_of_detection_matrix(rotate_detector_z(attenuation_map, angle), self.object_meta.dx), angle, negative=True)
+		for angles in torch.split(self.proj_meta.angles, n_parallel):
+			# Batch of angles: expand (no copy) the attenuation map along the batch dimension
+			attenuation_map_i = attenuation_map.expand(len(angles), *attenuation_map.shape[1:])
+			prob_matrix_i = get_prob_of_detection_matrix(rotate_detector_z(attenuation_map_i, angles), self.object_meta.dx)
+			average_norm_factor += rotate_detector_z(prob_matrix_i, angles, negative=True).sum(dim=0, keepdim=True)
 		average_norm_factor /= len(self.proj_meta.angles)
 		return unpad_object(average_norm_factor)
 